@@ -1,5 +1,6 @@
 import base64
 import binascii
+from functools import lru_cache
 import hashlib
 import json
 import logging.config
@@ -325,19 +326,24 @@ def get_integrations():
         integration_type = query_params['integration_type']
     except KeyError:
         raise BadRequestError('Parameters entity_type and integration_type must be given')
-    body = _fetch_integrations(entity_type, integration_type)
+    body = _fetch_integrations(entity_type, integration_type, config.dss_deployment_stage)
     return Response(status_code=200,
                     headers={"content-type": "application/json"},
                     body=json.dumps(body))
 
 
-def _fetch_integrations(entity_type, integration_type):
+# The integrations database is static so the result only depends on the arguments. The deployment stage is passed
+# explicitly because it is derived from the environment. The cache size is bounded because the entity and
+# integration type come straight from the request.
+
+@lru_cache(maxsize=64)
+def _fetch_integrations(entity_type, integration_type, dss_deployment_stage):
     plugin = Plugin.load()
     portals = plugin.portal_integrations_db()
     results = []
     for portal in portals:
         integrations = [
-            {k: v if k != 'entity_ids' else v[config.dss_deployment_stage] for k, v in integration.items()}
+            {k: v if k != 'entity_ids' else v[dss_deployment_stage] for k, v in integration.items()}
             for integration in cast(Sequence[JSON], portal['integrations'])
             if integration['entity_type'] == entity_type and integration['integration_type'] == integration_type
         ]
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import os
 import re
 from typing import List, Mapping, Optional, Tuple, Any
@@ -299,6 +300,9 @@ class Config:
         assert deployment_stage == self.deployment_stage
         return entity_type, aggregate
 
+    # Every document read from Elasticsearch carries the name of its index. The number of distinct index names is
+    # small so we cache the result of parsing them.
+    @lru_cache(maxsize=None)
     def parse_foreign_es_index_name(self, index_name) -> Tuple[str, str, str, bool]:
         """
         >>> config.parse_foreign_es_index_name('azul_foo_dev')
@@ -1,13 +1,14 @@
 from abc import ABC, abstractmethod
 from collections import Counter, defaultdict
-from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 import logging
-from operator import attrgetter
 import time
 from typing import Iterable, List, Mapping, MutableMapping, MutableSet, Union, Tuple, Optional
 
 from elasticsearch import ConflictError, ElasticsearchException
 from elasticsearch.helpers import parallel_bulk, scan, streaming_bulk
+from hca.dss import DSSClient
 from humancellatlas.data.metadata.helpers.dss import download_bundle_metadata
 from more_itertools import one
 
@@ -46,12 +47,21 @@ class BaseIndexer(ABC):
         # requests (though maybe at the cost of higher contention during indexing).
         _, aggregate = config.parse_es_index_name(index_name)
         num_shards = config.es_instance_count if aggregate else config.indexer_concurrency
-        return {
-            "index": {
-                "number_of_shards": num_shards,
-                "number_of_replicas": 1,
-                "refresh_interval": f"{config.es_refresh_interval}s"
+        settings = {
+            "number_of_shards": num_shards,
+            "number_of_replicas": 1,
+            "refresh_interval": f"{config.es_refresh_interval}s"
+        }
+        if not aggregate:
+            # The contributions indices take the brunt of the writes. Letting the translog grow larger before it is
+            # flushed results in fewer Lucene commits during indexing. Unlike an asynchronous translog, this doesn't
+            # jeopardize acknowledged writes, and unlike a longer refresh interval, it doesn't delay the visibility of
+            # contributions to the aggregation that follows shortly after.
+            settings["translog"] = {
+                "flush_threshold_size": "1gb"
             }
+        return {
+            "index": settings
         }
 
     @classmethod
@@ -98,12 +108,16 @@ class BaseIndexer(ABC):
         """
         bundle_uuid = dss_notification['match']['bundle_uuid']
         bundle_version = dss_notification['match']['bundle_version']
-        manifest, metadata_files = self._get_bundle(bundle_uuid, bundle_version)
-        # If indexing a test bundle we want to change the uuid so that we can delete the bundle after
-        bundle_uuid = self._add_test_modifications(bundle_uuid, manifest, metadata_files, dss_notification)
         # FIXME: this seems out of place. Consider creating indices at deploy time and avoid the mostly
         # redundant requests for every notification (https://github.com/DataBiosphere/azul/issues/427)
-        self._create_indices()
+        #
+        # Until then, we at least hide the latency of that step behind the download of the bundle.
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='indices') as tpe:
+            indices_created = tpe.submit(self._create_indices)
+            manifest, metadata_files = self._get_bundle(bundle_uuid, bundle_version)
+            indices_created.result()
+        # If indexing a test bundle we want to change the uuid so that we can delete the bundle after
+        bundle_uuid = self._add_test_modifications(bundle_uuid, manifest, metadata_files, dss_notification)
         log.info("Transforming metadata for bundle %s.%s", bundle_uuid, bundle_version)
         contributions = []
         for transformer in self.transformers():
@@ -116,16 +130,21 @@ class BaseIndexer(ABC):
 
     def _create_indices(self):
         es_client = ESClientFactory.get()
-        for index_name in self.index_names():
-            es_client.indices.create(index=index_name,
-                                     ignore=[400],
-                                     body=dict(settings=self.settings(index_name),
-                                               mappings=dict(doc=self.mapping())))
+        index_names = self.index_names()
+        # Normally all indices exist already. A single existence check for all of them replaces one create request per
+        # index. We can't remember the outcome of the check across notifications because indices may be deleted
+        # while the indexer is running, during a reindex for example, and writing a document to a missing index
+        # would implicitly create that index without our settings and mappings.
+        if not es_client.indices.exists(index=index_names):
+            for index_name in index_names:
+                es_client.indices.create(index=index_name,
+                                         ignore=[400],
+                                         body=dict(settings=self.settings(index_name),
+                                                   mappings=dict(doc=self.mapping())))
 
     def _get_bundle(self, bundle_uuid, bundle_version):
         now = time.time()
-        dss_client = config.dss_client(adapter_args=dict(pool_maxsize=config.num_dss_workers))
-        patch_client_for_direct_access(dss_client)
+        dss_client = self._dss_client(config.dss_endpoint, config.num_dss_workers)
         _, manifest, metadata_files = download_bundle_metadata(client=dss_client,
                                                                replica='aws',
                                                                uuid=bundle_uuid,
@@ -135,6 +154,18 @@ class BaseIndexer(ABC):
         assert _ == bundle_version
         return manifest, metadata_files
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _dss_client(cls, dss_endpoint: str, num_workers: int) -> DSSClient:
+        """
+        Return a DSS client for the given endpoint. The client is shared between bundles so that its connection pool,
+        the S3 client used for direct access and the API description retrieved by the constructor are reused. Sharing
+        the client between threads is fine, download_bundle_metadata() does that already.
+        """
+        dss_client = config.dss_client(dss_endpoint=dss_endpoint, adapter_args=dict(pool_maxsize=num_workers))
+        patch_client_for_direct_access(dss_client)
+        return dss_client
+
     def _add_test_modifications(self, bundle_uuid, manifest, metadata_files, dss_notification):
         integration_test_name = dss_notification.get('test_name', None)
         if integration_test_name is None:
@@ -217,6 +248,9 @@ class BaseIndexer(ABC):
                                   _index=Aggregate.index_name(entity.entity_type),
                                   _id=entity.entity_id)  # FIXME: assumes that document_id is entity_id for aggregates
                              for entity in entities])
+        if not request['docs']:
+            # Elasticsearch rejects an mget without any documents so we might as well save the round-trip
+            return {}
         response = ESClientFactory.get().mget(body=request, _source_include=Aggregate.mandatory_source_fields())
         aggregates = (Aggregate.from_index(doc) for doc in response['docs'] if doc['found'])
         aggregates = {a.entity: a for a in aggregates}
@@ -262,18 +296,21 @@ class BaseIndexer(ABC):
             # Track the raw, unfiltered number of contributions per entity
             tallies[contribution.entity] += 1
 
-        # For each entity and bundle, find the most recent contribution that is not a deletion
+        # For each entity and bundle, find the most recent contribution that is not a deletion. A deletion of a bundle
+        # version cancels all contributions by that version, so we determine the deleted versions first and then
+        # pick the latest of the remaining contributions in a single pass, without sorting.
         contributions_by_entity: Mapping[EntityReference, List[Contribution]] = defaultdict(list)
         for (entity, bundle_uuid), contributions in contributions_by_bundle.items():
-            contributions = sorted(contributions, key=attrgetter('bundle_version', 'bundle_deleted'), reverse=True)
-            for bundle_version, group in groupby(contributions, key=attrgetter('bundle_version')):
-                contribution = next(group)
-                if not contribution.bundle_deleted:
-                    assert bundle_uuid == contribution.bundle_uuid
-                    assert bundle_version == contribution.bundle_version
-                    assert entity == contribution.entity
-                    contributions_by_entity[entity].append(contribution)
-                    break
+            deleted_versions = {c.bundle_version for c in contributions if c.bundle_deleted}
+            latest = None
+            for contribution in contributions:
+                if contribution.bundle_version not in deleted_versions:
+                    if latest is None or latest.bundle_version < contribution.bundle_version:
+                        latest = contribution
+            if latest is not None:
+                assert bundle_uuid == latest.bundle_uuid
+                assert entity == latest.entity
+                contributions_by_entity[entity].append(latest)
 
         # Create lookup for transformer by entity type
         transformers = {t.entity_type(): t for t in self.transformers() if isinstance(t, AggregatingTransformer)}
@@ -344,6 +381,11 @@ class IndexWriter:
 
     bulk_threshold = 32
 
+    bulk_chunk_size = 500
+
+    # The maximum number of concurrent requests when writing documents individually
+    write_concurrency = 8
+
     def write(self, documents: List[Document], expect_update: bool):
         """
         Make an attempt to write the documents into the index, updating local state with failures and conflicts
@@ -363,21 +405,32 @@ class IndexWriter:
 
     def _write_individually(self, documents: Iterable[Document], expect_update: bool):
         log.info('Writing documents individually')
-        for doc in documents:
-            assert (doc.version_type is None) == expect_update, \
-                'version_type should only be set for aggregates which should not make updates'
-            update = doc.entity in self.update_retries
-            assert not update or expect_update, 'update implies expected_update'
-            try:
-                method = self.es_client.delete if doc.delete else self.es_client.index
-                method(refresh=self.refresh, **doc.to_index(update=update))
-            except ConflictError as e:
-                # Try again but update this time if we expect that possibility
-                self._on_conflict(doc, e, update=expect_update)
-            except ElasticsearchException as e:
-                self._on_error(doc, e)
-            else:
-                self._on_success(doc)
+
+        def write(doc: Document, update: bool):
+            method = self.es_client.delete if doc.delete else self.es_client.index
+            method(refresh=self.refresh, **doc.to_index(update=update))
+
+        # The requests are independent of each other so we issue them concurrently. The outcome of each request is
+        # handled on the calling thread such that the bookkeeping of errors, conflicts and retries needs no locking.
+        with ThreadPoolExecutor(max_workers=self.write_concurrency, thread_name_prefix='writer') as tpe:
+            futures = {}
+            for doc in documents:
+                assert (doc.version_type is None) == expect_update, \
+                    'version_type should only be set for aggregates which should not make updates'
+                update = doc.entity in self.update_retries
+                assert not update or expect_update, 'update implies expected_update'
+                futures[tpe.submit(write, doc, update)] = doc
+            for future in as_completed(futures):
+                doc = futures[future]
+                try:
+                    future.result()
+                except ConflictError as e:
+                    # Try again but update this time if we expect that possibility
+                    self._on_conflict(doc, e, update=expect_update)
+                except ElasticsearchException as e:
+                    self._on_error(doc, e)
+                else:
+                    self._on_success(doc)
 
     def _write_bulk(self, documents: Iterable[Document], expect_update: bool):
         documents: Mapping[DocumentCoordinates, Document] = {doc.coordinates: doc for doc in documents}
@@ -395,10 +448,14 @@ class IndexWriter:
         else:
             log.info('Writing documents using parallel_bulk().')
             helper = parallel_bulk
+        # With raise_on_exception=False, a transport error for one chunk marks every action in that chunk as failed
+        # instead of aborting the whole write and losing track of the documents in the chunks that did succeed.
         response = helper(client=self.es_client,
                           actions=actions,
                           refresh=self.refresh,
                           raise_on_error=False,
+                          raise_on_exception=False,
+                          chunk_size=self.bulk_chunk_size,
                           max_chunk_bytes=10485760)
         for success, info in response:
             op_type, info = one(info.items())
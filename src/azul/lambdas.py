@@ -1,4 +1,5 @@
 import ast
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 
 import boto3
@@ -19,10 +20,16 @@ class Lambdas:
         paginator = self.lambda_.get_paginator('list_functions')
         lambda_prefixes = [config.qualified_resource_name(lambda_infix) for lambda_infix in config.lambda_names()]
         assert all(lambda_prefixes)
-        for lambda_page in paginator.paginate(FunctionVersion='ALL', MaxItems=500):
-            for lambda_name in [metadata['FunctionName'] for metadata in lambda_page['Functions']]:
-                if any(lambda_name.startswith(prefix) for prefix in lambda_prefixes):
-                    self.manage_lambda(lambda_name, enabled)
+        # Managing a function takes several requests that only depend on that function, so we manage the functions
+        # concurrently. The pool is kept small to stay clear of the rate limit of the Lambda control plane.
+        with ThreadPoolExecutor(max_workers=4) as tpe:
+            futures = []
+            for lambda_page in paginator.paginate(FunctionVersion='ALL', MaxItems=500):
+                for lambda_name in [metadata['FunctionName'] for metadata in lambda_page['Functions']]:
+                    if any(lambda_name.startswith(prefix) for prefix in lambda_prefixes):
+                        futures.append(tpe.submit(self.manage_lambda, lambda_name, enabled))
+            for future in as_completed(futures):
+                future.result()
 
     def manage_lambda(self, lambda_name: str, enable: bool):
         lambda_settings = self.lambda_.get_function(FunctionName=lambda_name)
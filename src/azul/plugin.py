@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 import importlib
 from typing import Type, Sequence, NamedTuple, Mapping, Union
 
@@ -83,7 +84,15 @@ class Plugin(ABC):
 
         A plugin is an instance of a concrete subclass of the `Plugin` class.
         """
-        plugin_module = importlib.import_module(config.plugin_name)
+        return cls._load(config.plugin_name)
+
+    # Plugins are stateless so one instance per plugin module is enough. The module name is part of the cache key
+    # because it is derived from the environment.
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _load(cls, plugin_name: str) -> 'Plugin':
+        plugin_module = importlib.import_module(plugin_name)
         plugin_cls = plugin_module.Plugin
         assert issubclass(plugin_cls, cls)
         return plugin_cls()
@@ -1,10 +1,38 @@
+from functools import lru_cache
 from typing import Type
 
 from azul import config
 from azul.indexer import BaseIndexer
 import azul.plugin
 from azul.project.hca.indexer import Indexer
-from azul.types import JSON
+from azul.types import JSON, JSONs
+
+
+# The projects in the CBeta Release spreadsheet as of 11/13/2018, sorted so that the serialized query is stable
+_STAGING_PROJECT_IDS = (
+    "019a935b-ea35-4d83-be75-e1a688179328",  # neuron_diff
+    "08e7b6ba-5825-47e9-be2d-7978533c5f8c",  # pancreas6decades
+    "1f9a699a-262c-40a0-8b2c-7ba960ca388c",  # ido_amit
+    "2c4724a4-7252-409e-b008-ff5c127c7e89",  # treutlein
+    "2cd14cf5-f8e0-4c97-91a2-9e8957f41ea8",  # tabulamuris
+    "3eaad325-3666-4b65-a4ed-e23ff71222c1",  # rsatija
+    "46c58e08-4518-4e45-acfe-bdab2434975d",  # 10x-mouse-brain
+    "519b58ef-6462-4ed3-8c0d-375b54f53c31",  # EGEOD106540
+    "62aa3211-bf52-4873-9029-0bcc1d09e553",  # humphreys
+    "67bc798b-a34a-4104-8cab-cad648471f69",  # Teichmann
+    "81b5f43d-3c20-4575-9efa-bfb0b070a6e3",  # Meyer
+    "a5ae0428-476c-46d2-a9f2-aad955b149aa",  # EMTAB5061
+    "a71dee10-9a4d-4ea2-a6f3-ae7314112cf1",  # peer
+    "adabd2bd-3968-4e77-b0df-f200f7351661",  # Regev-ICA
+    "adb384b2-cd5e-4cf5-9205-5f066474005f",  # basu
+)
+
+# Matches bundles that were deleted by an administrator. Shared by both subscription queries.
+_ADMIN_DELETED_CLAUSE = {
+    "term": {
+        "admin_deleted": True
+    }
+}
 
 
 class Plugin(azul.plugin.Plugin):
@@ -13,102 +41,109 @@ class Plugin(azul.plugin.Plugin):
         return Indexer
 
     def dss_subscription_query(self, prefix: str) -> JSON:
+        return self._subscription_query(prefix, config.dss_endpoint)
+
+    # The subscription queries only depend on their arguments so we build each of them once per process. Callers
+    # must not modify the returned JSON. The endpoint is part of the cache key because it is read from the
+    # environment, which may change between invocations, as is the case in unit tests.
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _subscription_query(cls, prefix: str, dss_endpoint: str) -> JSON:
         return {
             "query": {
                 "bool": {
                     "must_not": [
-                        {
-                            "term": {
-                                "admin_deleted": True
-                            }
-                        }
+                        _ADMIN_DELETED_CLAUSE
                     ],
-                    "must": [
+                    "filter": [
                         {
                             "exists": {
                                 "field": "files.project_json"
                             }
                         },
-                        *self._prefix_clause(prefix),
-                        *(
-                            [
-                                {
-                                    "range": {
-                                        "manifest.version": {
-                                            "gte": "2018-11-27"
-                                        }
-                                    }
-                                }
-                            ] if config.dss_endpoint == "https://dss.integration.data.humancellatlas.org/v1" else [
-                                {
-                                    "bool": {
-                                        "should": [
-                                            {
-                                                "terms": {
-                                                    "files.project_json.provenance.document_id": [
-                                                        # CBeta Release spreadsheet as of 11/13/2018
-                                                        "2c4724a4-7252-409e-b008-ff5c127c7e89",  # treutlein
-                                                        "08e7b6ba-5825-47e9-be2d-7978533c5f8c",  # pancreas6decades
-                                                        "019a935b-ea35-4d83-be75-e1a688179328",  # neuron_diff
-                                                        "a5ae0428-476c-46d2-a9f2-aad955b149aa",  # EMTAB5061
-                                                        "adabd2bd-3968-4e77-b0df-f200f7351661",  # Regev-ICA
-                                                        "67bc798b-a34a-4104-8cab-cad648471f69",  # Teichmann
-                                                        "81b5f43d-3c20-4575-9efa-bfb0b070a6e3",  # Meyer
-                                                        "519b58ef-6462-4ed3-8c0d-375b54f53c31",  # EGEOD106540
-                                                        "2cd14cf5-f8e0-4c97-91a2-9e8957f41ea8",  # tabulamuris
-                                                        "1f9a699a-262c-40a0-8b2c-7ba960ca388c",  # ido_amit
-                                                        "62aa3211-bf52-4873-9029-0bcc1d09e553",  # humphreys
-                                                        "a71dee10-9a4d-4ea2-a6f3-ae7314112cf1",  # peer
-                                                        "adb384b2-cd5e-4cf5-9205-5f066474005f",  # basu
-                                                        "46c58e08-4518-4e45-acfe-bdab2434975d",  # 10x-mouse-brain
-                                                        "3eaad325-3666-4b65-a4ed-e23ff71222c1",  # rsatija
-                                                    ]
-                                                }
-                                            },
-                                            {
-                                                "range": {
-                                                    "manifest.version": {
-                                                        "gte": "2019-04-03"
-                                                    }
-                                                }
-                                            }
-                                        ]
-                                    }
-                                }
-                            ] if config.dss_endpoint == "https://dss.staging.data.humancellatlas.org/v1" else [
-                            ]
-                        )
+                        *cls._prefix_clause(prefix),
+                        *cls._endpoint_clauses(dss_endpoint)
                     ]
                 }
             }
         }
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _endpoint_clauses(cls, dss_endpoint: str) -> JSONs:
+        """
+        Additional clauses restricting the subscription to the bundles of interest in the given DSS instance.
+        """
+        if dss_endpoint == "https://dss.integration.data.humancellatlas.org/v1":
+            return [
+                {
+                    "range": {
+                        "manifest.version": {
+                            "gte": "2018-11-27"
+                        }
+                    }
+                }
+            ]
+        elif dss_endpoint == "https://dss.staging.data.humancellatlas.org/v1":
+            return [
+                {
+                    "bool": {
+                        "should": [
+                            {
+                                "terms": {
+                                    "files.project_json.provenance.document_id": _STAGING_PROJECT_IDS
+                                }
+                            },
+                            {
+                                "range": {
+                                    "manifest.version": {
+                                        "gte": "2019-04-03"
+                                    }
+                                }
+                            }
+                        ],
+                        "minimum_should_match": 1
+                    }
+                }
+            ]
+        else:
+            return []
+
     def dss_deletion_subscription_query(self, prefix: str) -> JSON:
+        return self._deletion_subscription_query(prefix)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _deletion_subscription_query(cls, prefix: str) -> JSON:
         return {
             "query": {
                 "bool": {
-                    "must": [
-                        {
-                            "term": {
-                                "admin_deleted": True
-                            }
-                        },
-                        *self._prefix_clause(prefix)
+                    "filter": [
+                        _ADMIN_DELETED_CLAUSE,
+                        *cls._prefix_clause(prefix)
                     ]
                 }
             }
         }
 
-    def _prefix_clause(self, prefix):
-        return [
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _prefix_clause(cls, prefix: str) -> JSONs:
+        return (
             {
                 'prefix': {
                     'uuid': prefix
                 }
-            }
-        ] if prefix else []
+            },
+        ) if prefix else ()
 
-    def service_config(self) -> azul.plugin.ServiceConfig:
+    # The service configuration and the integrations database are static. They are looked up on every request to the
+    # service so we build them only once per process. Callers must treat the returned structures as read-only.
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def service_config(cls) -> azul.plugin.ServiceConfig:
         return azul.plugin.ServiceConfig(
             translation={
                 "fileFormat": "contents.files.file_format",
@@ -252,7 +287,7 @@ class Plugin(azul.plugin.Plugin):
                     "bundles.version"
                 ]
             },
-            facets=[
+            facets=(
                 "organ",
                 "organPart",
                 "modelOrgan",
@@ -281,7 +316,7 @@ class Plugin(azul.plugin.Plugin):
                 "institution",
                 "contactName",
                 "publicationTitle"
-            ],
+            ),
             autocomplete_mapping_config={
                 "file": {
                     "dataType": "file_type",
@@ -304,16 +339,18 @@ class Plugin(azul.plugin.Plugin):
                     "id": "donor_uuid"
                 }
             },
-            order_config=[
+            order_config=(
                 "organ",
                 "organPart",
                 "biologicalSex",
                 "genusSpecies",
                 "protocol"
-            ]
+            )
         )
 
-    def portal_integrations_db(self) -> JSON:
+    @classmethod
+    @lru_cache(maxsize=None)
+    def portal_integrations_db(cls) -> JSON:
         """
         A hardcoded example database for use during development of the integrations API implementation
         """
@@ -1,7 +1,8 @@
 from abc import ABCMeta, abstractmethod
 from collections import Counter
+from functools import lru_cache
 import logging
-from typing import Any, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Set, Union
+from typing import Any, Callable, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Set, Tuple, Type, Union
 
 from humancellatlas.data.metadata import api
 
@@ -12,6 +13,7 @@ from azul.transformer import (Accumulator,
                               Contribution,
                               DistinctAccumulator,
                               Document,
+                              EntityAggregator,
                               EntityReference,
                               FrequencySetAccumulator,
                               GroupingAggregator,
@@ -29,41 +31,74 @@ Sample = Union[api.CellLine, api.Organoid, api.SpecimenFromOrganism]
 sample_types = api.CellLine, api.Organoid, api.SpecimenFromOrganism
 assert Sample.__args__ == sample_types  # since we can't use * in generic types
 
+AncestorSamples = MutableMapping[api.UUID4, Mapping[str, Sample]]
+
+
+@lru_cache(maxsize=4096)
+def _uuid_str(uuid: api.UUID4) -> str:
+    """
+    The string representation of the given UUID. The same ancestor entities are serialized for most of the
+    contributions from a bundle, and formatting a UUID is more expensive than looking it up in this cache.
+    """
+    return str(uuid)
+
+
+def _is_zarr_chunk(file: api.File) -> bool:
+    """
+    True if the given file is part of a Zarr store but not one of its .zattrs files. Such files are not indexed.
+    """
+    # FIXME: Remove once https://github.com/HumanCellAtlas/metadata-schema/issues/579 is resolved
+    #
+    # noinspection PyDeprecation
+    name = file.manifest_entry.name
+    return '.zarr!' in name and not name.endswith('.zattrs')
+
 
 class Transformer(AggregatingTransformer, metaclass=ABCMeta):
 
     def get_aggregator(self, entity_type):
-        if entity_type == 'files':
-            return FileAggregator()
-        elif entity_type == 'samples':
-            return SampleAggregator()
-        elif entity_type == 'specimens':
-            return SpecimenAggregator()
-        elif entity_type == 'cell_suspensions':
-            return CellSuspensionAggregator()
-        elif entity_type == 'cell_lines':
-            return CellLineAggregator()
-        elif entity_type == 'donors':
-            return DonorOrganismAggregator()
-        elif entity_type == 'organoids':
-            return OrganoidAggregator()
-        elif entity_type == 'projects':
-            return ProjectAggregator()
-        elif entity_type == 'protocols':
-            return ProtocolAggregator()
-        else:
+        try:
+            aggregator_cls = aggregator_classes[entity_type]
+        except KeyError:
             return super().get_aggregator(entity_type)
+        else:
+            return aggregator_cls()
 
-    def _find_ancestor_samples(self, entity: api.LinkedEntity, samples: MutableMapping[str, Sample]):
+    def _find_ancestor_samples(self,
+                               entity: api.LinkedEntity,
+                               samples: MutableMapping[str, Sample],
+                               cache: Optional[AncestorSamples] = None):
         """
         Populate the `samples` argument with the sample ancestors of the given entity. A sample is any biomaterial
         that is neither a cell suspension nor an ancestor of another sample.
+
+        :param cache: The sample ancestors of the entities visited so far. Pass the same dictionary when looking up
+                      the samples of several entities in a bundle so that shared ancestors are only visited once.
         """
-        if isinstance(entity, sample_types):
-            samples[str(entity.document_id)] = entity
-        else:
-            for parent in entity.parents.values():
-                self._find_ancestor_samples(parent, samples)
+        if cache is None:
+            cache = {}
+        # An iterative post-order traversal. Merging the samples of an entity's parents in order yields the samples
+        # in the same order as a recursive depth-first traversal would.
+        stack = [entity]
+        while stack:
+            top = stack[-1]
+            if top.document_id in cache:
+                stack.pop()
+            elif isinstance(top, sample_types):
+                cache[top.document_id] = {_uuid_str(top.document_id): top}
+                stack.pop()
+            else:
+                parents = list(top.parents.values())
+                pending = [parent for parent in parents if parent.document_id not in cache]
+                if pending:
+                    stack.extend(reversed(pending))
+                else:
+                    ancestor_samples = {}
+                    for parent in parents:
+                        ancestor_samples.update(cache[parent.document_id])
+                    cache[top.document_id] = ancestor_samples
+                    stack.pop()
+        samples.update(cache[entity.document_id])
 
     @classmethod
     def _contact_types(cls) -> Mapping[str, type]:
@@ -123,27 +158,14 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
 
     def _project(self, project: api.Project) -> JSON:
         # Store lists of all values of each of these facets to allow facet filtering
-        # and term counting on the webservice
-        laboratories: Set[str] = set()
-        institutions: Set[str] = set()
-        contact_names: Set[str] = set()
-        publication_titles: Set[str] = set()
-
-        for contributor in project.contributors:
-            if contributor.laboratory:
-                laboratories.add(contributor.laboratory)
-            # noinspection PyDeprecation
-            if contributor.contact_name:
-                # noinspection PyDeprecation
-                contact_names.add(contributor.contact_name)
-            if contributor.institution:
-                institutions.add(contributor.institution)
-
-        for publication in project.publications:
-            # noinspection PyDeprecation
-            if publication.publication_title:
-                # noinspection PyDeprecation
-                publication_titles.add(publication.publication_title)
+        # and term counting on the webservice. Using filter() to drop empty values reads each attribute only once.
+        contributors = project.contributors
+        laboratories: Set[str] = set(filter(None, (c.laboratory for c in contributors)))
+        institutions: Set[str] = set(filter(None, (c.institution for c in contributors)))
+        # noinspection PyDeprecation
+        contact_names: Set[str] = set(filter(None, (c.contact_name for c in contributors)))
+        # noinspection PyDeprecation
+        publication_titles: Set[str] = set(filter(None, (p.publication_title for p in project.publications)))
 
         return {
             'project_title': project.project_title,
@@ -153,7 +175,7 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
             'institutions': list(institutions),
             'contact_names': list(contact_names),
             'contributors': [self._contact(c) for c in project.contributors],
-            'document_id': str(project.document_id),
+            'document_id': _uuid_str(project.document_id),
             'publication_titles': list(publication_titles),
             'publications': [self._publication(p) for p in project.publications],
             'insdc_project_accessions': list(project.insdc_project_accessions),
@@ -182,7 +204,7 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
         return {
             'has_input_biomaterial': specimen.has_input_biomaterial,
             '_source': api.schema_names[type(specimen)],
-            'document_id': str(specimen.document_id),
+            'document_id': _uuid_str(specimen.document_id),
             'biomaterial_id': specimen.biomaterial_id,
             'disease': list(specimen.diseases),
             'organ': specimen.organ,
@@ -220,7 +242,7 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
             else:
                 assert False
         return {
-            'document_id': str(cell_suspension.document_id),
+            'document_id': _uuid_str(cell_suspension.document_id),
             'total_estimated_cells': cell_suspension.estimated_cell_count,
             'selected_cell_type': list(cell_suspension.selected_cell_types),
             'organ': list(organs),
@@ -239,7 +261,7 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
     def _cell_line(self, cell_line: api.CellLine) -> JSON:
         # noinspection PyDeprecation
         return {
-            'document_id': str(cell_line.document_id),
+            'document_id': _uuid_str(cell_line.document_id),
             'biomaterial_id': cell_line.biomaterial_id,
             'cell_line_type': cell_line.cell_line_type,
             'model_organ': cell_line.model_organ
@@ -259,24 +281,22 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
         }
 
     def _donor(self, donor: api.DonorOrganism) -> JSON:
-        return {
-            'document_id': str(donor.document_id),
+        donor_ = {
+            'document_id': _uuid_str(donor.document_id),
             'biomaterial_id': donor.biomaterial_id,
             'biological_sex': donor.sex,
             'genus_species': list(donor.genus_species),
             'diseases': list(donor.diseases),
             'organism_age': donor.organism_age,
-            'organism_age_unit': donor.organism_age_unit,
-            **(
-                {
-                    'organism_age_range': {
-                        'gte': donor.organism_age_in_seconds.min,
-                        'lte': donor.organism_age_in_seconds.max
-                    }
-                } if donor.organism_age_in_seconds else {
-                }
-            )
+            'organism_age_unit': donor.organism_age_unit
         }
+        organism_age_in_seconds = donor.organism_age_in_seconds
+        if organism_age_in_seconds:
+            donor_['organism_age_range'] = {
+                'gte': organism_age_in_seconds.min,
+                'lte': organism_age_in_seconds.max
+            }
+        return donor_
 
     @classmethod
     def _organoid_types(cls) -> Mapping[str, type]:
@@ -289,7 +309,7 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
 
     def _organoid(self, organoid: api.Organoid) -> JSON:
         return {
-            'document_id': str(organoid.document_id),
+            'document_id': _uuid_str(organoid.document_id),
             'biomaterial_id': organoid.biomaterial_id,
             'model_organ': organoid.model_organ,
             'model_organ_part': organoid.model_organ_part
@@ -315,7 +335,7 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
 
     def _file(self, file: api.File) -> JSON:
         # noinspection PyDeprecation
-        return {
+        file_ = {
             'content-type': file.manifest_entry.content_type,
             'indexed': file.manifest_entry.indexed,
             'name': file.manifest_entry.name,
@@ -323,17 +343,14 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
             'size': file.manifest_entry.size,
             'uuid': file.manifest_entry.uuid,
             'version': file.manifest_entry.version,
-            'document_id': str(file.document_id),
+            'document_id': _uuid_str(file.document_id),
             'file_format': file.file_format,
-            '_type': 'file',
-            **(
-                {
-                    'read_index': file.read_index,
-                    'lane_index': file.lane_index
-                } if isinstance(file, api.SequenceFile) else {
-                }
-            )
+            '_type': 'file'
         }
+        if isinstance(file, api.SequenceFile):
+            file_['read_index'] = file.read_index
+            file_['lane_index'] = file.lane_index
+        return file_
 
     @classmethod
     def _protocol_types(cls) -> Mapping[str, type]:
@@ -357,7 +374,8 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
         elif isinstance(protocol, api.AnalysisProtocol):
             protocol_['workflow'] = protocol.protocol_id
         elif isinstance(protocol, api.ImagingProtocol):
-            protocol_['assay_type'] = dict(Counter(target.assay_type for target in protocol.target))
+            # A Counter is a dict so there is no need to copy it
+            protocol_['assay_type'] = Counter(target.assay_type for target in protocol.target)
         else:
             assert False
         return protocol_
@@ -372,16 +390,22 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
             **cls._specimen_types()
         }
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _sample_serializer(cls, sample_cls: type) -> Tuple[str, Callable[['Transformer', Sample], JSON]]:
+        """
+        The entity type of samples of the given class and the method for converting such samples to JSON.
+        """
+        for base_cls, entity_type, serializer in ((api.CellLine, 'cell_lines', cls._cell_line),
+                                                  (api.Organoid, 'organoids', cls._organoid),
+                                                  (api.SpecimenFromOrganism, 'specimens', cls._specimen)):
+            if issubclass(sample_cls, base_cls):
+                return entity_type, serializer
+        require(False, sample_cls)
+
     def _sample(self, sample: api.Biomaterial) -> JSON:
-        entity_type, sample_ = (
-            'cell_lines', self._cell_line(sample)
-        ) if isinstance(sample, api.CellLine) else (
-            'organoids', self._organoid(sample)
-        ) if isinstance(sample, api.Organoid) else (
-            'specimens', self._specimen(sample)
-        ) if isinstance(sample, api.SpecimenFromOrganism) else (
-            require(False, sample), None
-        )
+        entity_type, serializer = self._sample_serializer(type(sample))
+        sample_ = serializer(self, sample)
         sample_['entity_type'] = entity_type
         assert hasattr(sample, 'organ') != hasattr(sample, 'model_organ')
         sample_['effective_organ'] = sample.organ if hasattr(sample, 'organ') else sample.model_organ
@@ -397,11 +421,11 @@ class Transformer(AggregatingTransformer, metaclass=ABCMeta):
 
     def _contribution(self, bundle: api.Bundle, contents: JSON, entity_id: api.UUID4, deleted: bool) -> Contribution:
         entity_reference = EntityReference(entity_type=self.entity_type(),
-                                           entity_id=str(entity_id))
+                                           entity_id=_uuid_str(entity_id))
         return Contribution(entity=entity_reference,
                             version=None,
                             contents=contents,
-                            bundle_uuid=str(bundle.uuid),
+                            bundle_uuid=_uuid_str(bundle.uuid),
                             bundle_version=bundle.version,
                             bundle_deleted=deleted)
 
@@ -439,17 +463,27 @@ class TransformerVisitor(api.EntityVisitor):
         self.protocols = {}
         self.files = {}
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _biomaterial_attribute(cls, entity_cls: type) -> Optional[str]:
+        """
+        The name of the attribute tracking entities of the given class, or None if the class is not one of the
+        biomaterial classes tracked by this visitor. The result is cached per class so that visit() doesn't have to
+        test an entity against each of these classes in turn.
+        """
+        for biomaterial_cls, attribute in ((api.SpecimenFromOrganism, 'specimens'),
+                                           (api.CellSuspension, 'cell_suspensions'),
+                                           (api.CellLine, 'cell_lines'),
+                                           (api.DonorOrganism, 'donors'),
+                                           (api.Organoid, 'organoids')):
+            if issubclass(entity_cls, biomaterial_cls):
+                return attribute
+        return None
+
     def visit(self, entity: api.Entity) -> None:
-        if isinstance(entity, api.SpecimenFromOrganism):
-            self.specimens[entity.document_id] = entity
-        elif isinstance(entity, api.CellSuspension):
-            self.cell_suspensions[entity.document_id] = entity
-        elif isinstance(entity, api.CellLine):
-            self.cell_lines[entity.document_id] = entity
-        elif isinstance(entity, api.DonorOrganism):
-            self.donors[entity.document_id] = entity
-        elif isinstance(entity, api.Organoid):
-            self.organoids[entity.document_id] = entity
+        attribute = self._biomaterial_attribute(type(entity))
+        if attribute is not None:
+            getattr(self, attribute)[entity.document_id] = entity
         elif isinstance(entity, api.Process):
             for protocol in entity.protocols.values():
                 if isinstance(protocol, (api.SequencingProtocol,
@@ -458,10 +492,7 @@ class TransformerVisitor(api.EntityVisitor):
                                          api.ImagingProtocol)):
                     self.protocols[protocol.document_id] = protocol
         elif isinstance(entity, api.File):
-            # noinspection PyDeprecation
-            if '.zarr!' in entity.manifest_entry.name and not entity.manifest_entry.name.endswith('.zattrs'):
-                # FIXME: Remove once https://github.com/HumanCellAtlas/metadata-schema/issues/579 is resolved
-                #
+            if _is_zarr_chunk(entity):
                 return
             self.files[entity.document_id] = entity
 
@@ -483,27 +514,25 @@ class FileTransformer(Transformer):
                             manifest=manifest,
                             metadata_files=metadata_files)
         project = self._get_project(bundle)
+        project_ = self._project(project)
+        ancestor_samples: AncestorSamples = {}
         for file in bundle.files.values():
-            # noinspection PyDeprecation
-            if '.zarr!' in file.manifest_entry.name and not file.manifest_entry.name.endswith('.zattrs'):
-                # FIXME: Remove once https://github.com/HumanCellAtlas/metadata-schema/issues/579 is resolved
-                #
+            if _is_zarr_chunk(file):
                 continue
             visitor = TransformerVisitor()
             file.accept(visitor)
             file.ancestors(visitor)
             samples: MutableMapping[str, Sample] = dict()
-            self._find_ancestor_samples(file, samples)
-            contents = dict(samples=[self._sample(s) for s in samples.values()],
-                            specimens=[self._specimen(s) for s in visitor.specimens.values()],
-                            cell_suspensions=[self._cell_suspension(cs) for cs in
-                                              visitor.cell_suspensions.values()],
-                            cell_lines=[self._cell_line(cl) for cl in visitor.cell_lines.values()],
-                            donors=[self._donor(d) for d in visitor.donors.values()],
-                            organoids=[self._organoid(o) for o in visitor.organoids.values()],
-                            files=[self._file(file)],
-                            protocols=[self._protocol(pl) for pl in visitor.protocols.values()],
-                            projects=[self._project(project)])
+            self._find_ancestor_samples(file, samples, ancestor_samples)
+            contents = {'samples': [self._sample(s) for s in samples.values()],
+                        'specimens': [self._specimen(s) for s in visitor.specimens.values()],
+                        'cell_suspensions': [self._cell_suspension(cs) for cs in visitor.cell_suspensions.values()],
+                        'cell_lines': [self._cell_line(cl) for cl in visitor.cell_lines.values()],
+                        'donors': [self._donor(d) for d in visitor.donors.values()],
+                        'organoids': [self._organoid(o) for o in visitor.organoids.values()],
+                        'files': [self._file(file)],
+                        'protocols': [self._protocol(pl) for pl in visitor.protocols.values()],
+                        'projects': [project_]}
             yield self._contribution(bundle, contents, file.document_id, deleted)
 
 
@@ -524,23 +553,25 @@ class CellSuspensionTransformer(Transformer):
                             manifest=manifest,
                             metadata_files=metadata_files)
         project = self._get_project(bundle)
+        project_ = self._project(project)
+        ancestor_samples: AncestorSamples = {}
         for cell_suspension in bundle.biomaterials.values():
             if not isinstance(cell_suspension, api.CellSuspension):
                 continue
             samples: MutableMapping[str, Sample] = dict()
-            self._find_ancestor_samples(cell_suspension, samples)
+            self._find_ancestor_samples(cell_suspension, samples, ancestor_samples)
             visitor = TransformerVisitor()
             cell_suspension.accept(visitor)
             cell_suspension.ancestors(visitor)
-            contents = dict(samples=[self._sample(s) for s in samples.values()],
-                            specimens=[self._specimen(s) for s in visitor.specimens.values()],
-                            cell_suspensions=[self._cell_suspension(cell_suspension)],
-                            cell_lines=[self._cell_line(cl) for cl in visitor.cell_lines.values()],
-                            donors=[self._donor(d) for d in visitor.donors.values()],
-                            organoids=[self._organoid(o) for o in visitor.organoids.values()],
-                            files=[self._file(f) for f in visitor.files.values()],
-                            protocols=[self._protocol(pl) for pl in visitor.protocols.values()],
-                            projects=[self._project(project)])
+            contents = {'samples': [self._sample(s) for s in samples.values()],
+                        'specimens': [self._specimen(s) for s in visitor.specimens.values()],
+                        'cell_suspensions': [self._cell_suspension(cell_suspension)],
+                        'cell_lines': [self._cell_line(cl) for cl in visitor.cell_lines.values()],
+                        'donors': [self._donor(d) for d in visitor.donors.values()],
+                        'organoids': [self._organoid(o) for o in visitor.organoids.values()],
+                        'files': [self._file(f) for f in visitor.files.values()],
+                        'protocols': [self._protocol(pl) for pl in visitor.protocols.values()],
+                        'projects': [project_]}
             yield self._contribution(bundle, contents, cell_suspension.document_id, deleted)
 
 
@@ -561,23 +592,24 @@ class SampleTransformer(Transformer):
                             manifest=manifest,
                             metadata_files=metadata_files)
         project = self._get_project(bundle)
+        project_ = self._project(project)
         samples: MutableMapping[str, Sample] = dict()
+        ancestor_samples: AncestorSamples = {}
         for file in bundle.files.values():
-            self._find_ancestor_samples(file, samples)
+            self._find_ancestor_samples(file, samples, ancestor_samples)
         for sample in samples.values():
             visitor = TransformerVisitor()
             sample.accept(visitor)
             sample.ancestors(visitor)
-            contents = dict(samples=[self._sample(sample)],
-                            specimens=[self._specimen(s) for s in visitor.specimens.values()],
-                            cell_suspensions=[self._cell_suspension(cs) for cs in
-                                              visitor.cell_suspensions.values()],
-                            cell_lines=[self._cell_line(cl) for cl in visitor.cell_lines.values()],
-                            donors=[self._donor(d) for d in visitor.donors.values()],
-                            organoids=[self._organoid(o) for o in visitor.organoids.values()],
-                            files=[self._file(f) for f in visitor.files.values()],
-                            protocols=[self._protocol(pl) for pl in visitor.protocols.values()],
-                            projects=[self._project(project)])
+            contents = {'samples': [self._sample(sample)],
+                        'specimens': [self._specimen(s) for s in visitor.specimens.values()],
+                        'cell_suspensions': [self._cell_suspension(cs) for cs in visitor.cell_suspensions.values()],
+                        'cell_lines': [self._cell_line(cl) for cl in visitor.cell_lines.values()],
+                        'donors': [self._donor(d) for d in visitor.donors.values()],
+                        'organoids': [self._organoid(o) for o in visitor.organoids.values()],
+                        'files': [self._file(f) for f in visitor.files.values()],
+                        'protocols': [self._protocol(pl) for pl in visitor.protocols.values()],
+                        'projects': [project_]}
             yield self._contribution(bundle, contents, sample.document_id, deleted)
 
 
@@ -607,21 +639,22 @@ class BundleProjectTransformer(Transformer, metaclass=ABCMeta):
             specimen.accept(visitor)
             specimen.ancestors(visitor)
         samples: MutableMapping[str, Sample] = dict()
+        ancestor_samples: AncestorSamples = {}
         for file in bundle.files.values():
             file.accept(visitor)
             file.ancestors(visitor)
-            self._find_ancestor_samples(file, samples)
+            self._find_ancestor_samples(file, samples, ancestor_samples)
         project = self._get_project(bundle)
 
-        contents = dict(samples=[self._sample(s) for s in samples.values()],
-                        specimens=[self._specimen(s) for s in visitor.specimens.values()],
-                        cell_suspensions=[self._cell_suspension(cs) for cs in visitor.cell_suspensions.values()],
-                        cell_lines=[self._cell_line(cl) for cl in visitor.cell_lines.values()],
-                        donors=[self._donor(d) for d in visitor.donors.values()],
-                        organoids=[self._organoid(o) for o in visitor.organoids.values()],
-                        files=[self._file(f) for f in visitor.files.values()],
-                        protocols=[self._protocol(pl) for pl in visitor.protocols.values()],
-                        projects=[self._project(project)])
+        contents = {'samples': [self._sample(s) for s in samples.values()],
+                    'specimens': [self._specimen(s) for s in visitor.specimens.values()],
+                    'cell_suspensions': [self._cell_suspension(cs) for cs in visitor.cell_suspensions.values()],
+                    'cell_lines': [self._cell_line(cl) for cl in visitor.cell_lines.values()],
+                    'donors': [self._donor(d) for d in visitor.donors.values()],
+                    'organoids': [self._organoid(o) for o in visitor.organoids.values()],
+                    'files': [self._file(f) for f in visitor.files.values()],
+                    'protocols': [self._protocol(pl) for pl in visitor.protocols.values()],
+                    'projects': [self._project(project)]}
 
         yield self._contribution(bundle, contents, self._get_entity_id(bundle, project), deleted)
 
@@ -770,3 +803,16 @@ class ProtocolAggregator(SimpleAggregator):
             return FrequencySetAccumulator(max_size=100)
         else:
             return SetAccumulator()
+
+
+aggregator_classes: Mapping[str, Type[EntityAggregator]] = {
+    'files': FileAggregator,
+    'samples': SampleAggregator,
+    'specimens': SpecimenAggregator,
+    'cell_suspensions': CellSuspensionAggregator,
+    'cell_lines': CellLineAggregator,
+    'donors': DonorOrganismAggregator,
+    'organoids': OrganoidAggregator,
+    'projects': ProjectAggregator,
+    'protocols': ProtocolAggregator
+}
@@ -1,4 +1,5 @@
 from logging import getLogger
+import random
 from time import sleep
 from typing import Dict, List, Optional, Any
 from uuid import uuid4
@@ -66,8 +67,10 @@ class CollectionDataAccess:
             if delay > self.DEFAULT_MAX_BACKOFF_TIME:
                 logger.warning('Request %s: The request fails to respond within the time limit.', request_id)
                 raise ServerTimeoutError(uuid)
-            logger.info('Request %s: Retrying in %d s', request_id, delay)
-            sleep(delay)
+            # Randomize the delay so that clients that failed at the same time don't all retry at the same time
+            delay_with_jitter = random.uniform(delay / 2, delay)
+            logger.info('Request %s: Retrying in %.3f s', request_id, delay_with_jitter)
+            sleep(delay_with_jitter)
             logger.info('Request %s: Resuming', request_id)
         request_params = dict(params=params,
                               headers=dict(Authorization=self.access_token))
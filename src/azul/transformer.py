@@ -17,6 +17,10 @@ from azul.types import JSON, AnyJSON, AnyMutableJSON
 
 MIN_INT = -sys.maxsize - 1
 
+# Translation of boolean fields. Elasticsearch can't index None so we represent booleans as integers.
+_bool_to_int = {None: -1, False: 0, True: 1}
+_int_to_bool = {v: k for k, v in _bool_to_int.items()}
+
 logger = logging.getLogger(__name__)
 
 Entities = List[JSON]
@@ -55,10 +59,14 @@ class Document:
         return Plugin.load().field_types()
 
     @classmethod
-    @lru_cache(maxsize=64)
+    @lru_cache(maxsize=None)
     def _field_type(cls, path: Tuple[str, ...]) -> Any:
         """
         Get the field type of a field specified by the full field name split on '.'
+
+        The number of distinct paths is bounded by the field types of the plugin. Every document translation visits
+        most of them so the cache is unbounded rather than evicting entries that are about to be needed again.
+
         :param path: A tuple of keys to traverse down the field_types dict
         """
         types_mapping = cls.field_types()
@@ -83,10 +91,7 @@ class Document:
         """
         field_type = cls._field_type(path)
         if field_type is bool:
-            if forward:
-                return {None: -1, False: 0, True: 1}[value]
-            else:
-                return {-1: None, 0: False, 1: True}[value]
+            return (_bool_to_int if forward else _int_to_bool)[value]
         elif field_type is int or field_type is float:
             if forward:
                 if value is None:
@@ -722,8 +727,8 @@ class AggregatingTransformer(Transformer, metaclass=ABCMeta):
                     entity: JSON
                     for entity in entities:
                         entity_id = entity['document_id']  # FIXME: the key 'document_id' is HCA specific
-                        bundle_version, _ = collated_entities.get(entity_id, ('', None))
-                        if bundle_version < contribution.bundle_version:
+                        collated_entity = collated_entities.get(entity_id)
+                        if collated_entity is None or collated_entity[0] < contribution.bundle_version:
                             collated_entities[entity_id] = contribution.bundle_version, entity
             return {
                 entity_type: [entity for _, entity in entities.values()]
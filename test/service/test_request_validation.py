@@ -46,8 +46,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'bad-facet': {'is': ['fake-val']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_multiple_filter_facet_of_sample(self):
         url = self.base_url + '/repository/samples'
@@ -56,8 +57,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'bad-facet': {'is': ['fake-val']}, 'bad-facet2': {'is': ['fake-val2']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_mixed_multiple_filter_facet_of_sample(self):
         url = self.base_url + '/repository/samples'
@@ -66,8 +68,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'organPart': {'is': ['fake-val']}, 'bad-facet': {'is': ['fake-val']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_sort_facet_of_sample(self):
         url = self.base_url + '/repository/samples'
@@ -78,8 +81,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'order': 'asc',
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_sort_facet_and_filter_facet_of_sample(self):
         url = self.base_url + '/repository/samples'
@@ -90,8 +94,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'order': 'asc',
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertTrue(response.json() in [self.facet_message, self.facet_message])
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertTrue(body in [self.facet_message, self.facet_message])
 
     def test_valid_sort_facet_but_bad_filter_facet_of_sample(self):
         url = self.base_url + '/repository/samples'
@@ -102,8 +107,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'order': 'asc',
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_sort_facet_but_valid_filter_facet_of_sample(self):
         url = self.base_url + '/repository/samples'
@@ -114,8 +120,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'order': 'asc',
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_single_filter_facet_of_file(self):
         url = self.base_url + '/repository/files'
@@ -124,8 +131,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'bad-facet': {'is': ['fake-val2']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_multiple_filter_facet_of_file(self):
         url = self.base_url + '/repository/files'
@@ -134,8 +142,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'bad-facet': {'is': ['fake-val']}, 'bad-facet2': {'is': ['fake-val2']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_mixed_multiple_filter_facet_of_file(self):
         url = self.base_url + '/repository/files'
@@ -144,8 +153,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'organPart': {'is': ['fake-val']}, 'bad-facet': {'is': ['fake-val']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_sort_facet_of_file(self):
         url = self.base_url + '/repository/files'
@@ -156,8 +166,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_bad_sort_facet_and_filter_facet_of_file(self):
         url = self.base_url + '/repository/files'
@@ -166,8 +177,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'bad-facet': {'is': ['fake-val2']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertTrue(response.json() in [self.facet_message, self.facet_message])
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertTrue(body in [self.facet_message, self.facet_message])
 
     def test_bad_sort_facet_but_valid_filter_facet_of_file(self):
         url = self.base_url + '/repository/files'
@@ -178,8 +190,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'organ': {'is': ['fake-val2']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_valid_sort_facet_but_bad_filter_facet_of_file(self):
 
@@ -191,8 +204,9 @@ class FacetNameValidationTest(WebServiceTestCase):
             'filters': json.dumps({'bad-facet': {'is': ['fake-val2']}}),
         }
         response = requests.get(url, params=params)
-        self.assertEqual(400, response.status_code, response.json())
-        self.assertEqual(self.facet_message, response.json())
+        body = response.json()
+        self.assertEqual(400, response.status_code, body)
+        self.assertEqual(self.facet_message, body)
 
     def test_single_entity_error_responses(self):
         entity_types = ['files', 'projects']
@@ -208,9 +222,10 @@ class FacetNameValidationTest(WebServiceTestCase):
     def test_file_order(self):
         url = self.base_url + '/repository/files/order'
         response = requests.get(url)
-        self.assertEqual(200, response.status_code, response.json())
-        actual_field_order = response.json()['order']
-        expected_field_order = Plugin.load().service_config().order_config
+        body = response.json()
+        self.assertEqual(200, response.status_code, body)
+        actual_field_order = body['order']
+        expected_field_order = list(Plugin.load().service_config().order_config)
         self.assertEqual(expected_field_order, actual_field_order)
 
     def test_bad_query_params(self):
@@ -222,12 +237,14 @@ class FacetNameValidationTest(WebServiceTestCase):
                     'some_nonexistent_filter': 1,
                 }
                 response = requests.get(url, params=params)
-                self.assertEqual(400, response.status_code, response.json())
-                self.assertEqual('BadRequestError', response.json()['Code'])
+                body = response.json()
+                self.assertEqual(400, response.status_code, body)
+                self.assertEqual('BadRequestError', body['Code'])
             with self.subTest(test='malformed parameter', entity_type=entity_type):
                 params = {
                     'size': 'foo',
                 }
                 response = requests.get(url, params=params)
-                self.assertEqual(400, response.status_code, response.json())
-                self.assertEqual('BadRequestError', response.json()['Code'])
+                body = response.json()
+                self.assertEqual(400, response.status_code, body)
+                self.assertEqual('BadRequestError', body['Code'])